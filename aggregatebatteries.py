@@ -19,32 +19,175 @@ import logging
 import sys
 import os
 import platform
+import atexit
+import signal
 import dbus
 import re
+import math
+import functools
 import settings
 from functions import Functions
-from datetime import datetime as dt  # for UTC time stamps for logging
-import time as tt  # for charge measurement
+from datetime import datetime as dt  # for month and day of the year
+import time as tt  # for charge measurement (monotonic clock)
 from dbusmon import DbusMon
-from threading import Thread
 
 sys.path.append("/opt/victronenergy/dbus-systemcalc-py/ext/velib_python")
 from vedbus import VeDbusService  # noqa: E402
 
 VERSION = "3.5.20250516"
 
-class SystemBus(dbus.bus.BusConnection):
-    def __new__(cls):
-        return dbus.bus.BusConnection.__new__(cls, dbus.bus.BusConnection.TYPE_SYSTEM)
+# state files, plain text with one number (see README)
+CHARGE_FILE = "/data/dbus-aggregate-batteries/charge"
+LAST_BALANCING_FILE = "/data/dbus-aggregate-batteries/last_balancing"
+
+# minimum time in seconds between two updates of the charge file, default for settings.py of older versions
+CHARGE_SAVE_PERIOD = getattr(settings, "CHARGE_SAVE_PERIOD", 60)
+
+# bus names are reused by all searches within this time in seconds
+NAMES_CACHE_TIME = 2
+
+# services searched by the discovery, a new name with one of these prefixes triggers a search
+DISCOVERY_PREFIXES = (
+    "com.victronenergy.settings",
+    settings.BATTERY_SERVICE_NAME,
+    settings.MULTI_KEY_WORD,
+    settings.MPPT_KEY_WORD,
+)
+
+# discovery retry delay in ms, doubled after each unsuccessful search up to the maximum
+DISCOVERY_RETRY_MIN = 250
+DISCOVERY_RETRY_MAX = 10000
+
+# noisy values are sent to DBus only if changed by at least this amount {path: tolerance}
+PUBLISH_TOLERANCE = {
+    "/Dc/0/Voltage": 0.01,
+    "/Dc/0/Current": 0.01,
+    "/Dc/0/Power": 1,
+    "/Voltages/Sum": 0.01,
+    "/Dc/0/Temperature": 0.1,
+    "/Capacity": 0.1,
+    "/ConsumedAmphours": 0.1,
+    "/TimeToGo": 60,
+}
+
+# cell voltage paths of the physical batteries
+CELL_VOLTAGE_PATHS = tuple(
+    "/Voltages/Cell%d" % cellId
+    for cellId in range(1, settings.NR_OF_CELLS_PER_BATTERY + 1)
+)
+
+# alarms aggregated as maximum of all batteries (own path, path of the physical batteries)
+ALARM_PATHS = (
+    ("/Alarms/LowVoltage", "/Alarms/LowVoltage"),
+    ("/Alarms/HighVoltage", "/Alarms/HighVoltage"),
+    ("/Alarms/LowCellVoltage", "/Alarms/LowCellVoltage"),
+    ("/Alarms/LowSoc", "/Alarms/LowSoc"),
+    ("/Alarms/HighChargeCurrent", "/Alarms/HighChargeCurrent"),
+    ("/Alarms/HighDischargeCurrent", "/Alarms/HighDischargeCurrent"),
+    ("/Alarms/CellImbalance", "/Alarms/CellImbalance"),
+    ("/Alarms/InternalFailure", "/Alarms/InternalFailure_alarm"),
+    ("/Alarms/HighChargeTemperature", "/Alarms/HighChargeTemperature"),
+    ("/Alarms/LowChargeTemperature", "/Alarms/LowChargeTemperature"),
+    ("/Alarms/HighTemperature", "/Alarms/HighTemperature"),
+    ("/Alarms/LowTemperature", "/Alarms/LowTemperature"),
+    ("/Alarms/BmsCable", "/Alarms/BmsCable"),
+)
+
+
+# text shown in the GUI, shared by all paths of the same unit
+def _format_voltage(path, value):
+    return "%.2fV" % value
+
+
+def _format_cell_voltage(path, value):
+    return "%.3fV" % value
+
+
+def _format_current(path, value):
+    return "%.2fA" % value
+
+
+def _format_current_limit(path, value):
+    return "%.1fA" % value
+
+
+def _format_power(path, value):
+    return "%.0fW" % value
+
+
+def _format_charge(path, value):
+    return "%.0fAh" % value
+
+
+# paths of the aggregate service created without value (path, writeable, gettextcallback)
+SERVICE_PATHS = (
+    # DC
+    ("/Dc/0/Voltage", True, _format_voltage),
+    ("/Dc/0/Current", True, _format_current),
+    ("/Dc/0/Power", True, _format_power),
+    # capacity
+    ("/Soc", True, None),
+    ("/Capacity", True, _format_charge),
+    ("/InstalledCapacity", False, _format_charge),
+    ("/ConsumedAmphours", False, _format_charge),
+    # temperature
+    ("/Dc/0/Temperature", True, None),
+    ("/System/MinCellTemperature", True, None),
+    ("/System/MaxCellTemperature", True, None),
+    # extras
+    ("/System/MinCellVoltage", True, _format_cell_voltage),  # marvo2011
+    ("/System/MinVoltageCellId", True, None),
+    ("/System/MaxCellVoltage", True, _format_cell_voltage),  # marvo2011
+    ("/System/MaxVoltageCellId", True, None),
+    ("/System/NrOfCellsPerBattery", True, None),
+    ("/System/NrOfModulesOnline", True, None),
+    ("/System/NrOfModulesOffline", True, None),
+    ("/System/NrOfModulesBlockingCharge", True, None),
+    ("/System/NrOfModulesBlockingDischarge", True, None),
+    ("/Voltages/Sum", True, _format_cell_voltage),
+    ("/Voltages/Diff", True, _format_cell_voltage),
+    ("/TimeToGo", True, None),
+    # alarms, '/Alarms/HighCellVoltage' is not implemented in Venus
+    *((path, True, None) for path, _ in ALARM_PATHS),
+    # control
+    ("/Info/MaxChargeCurrent", True, _format_current_limit),
+    ("/Info/MaxDischargeCurrent", True, _format_current_limit),
+    ("/Info/MaxChargeVoltage", True, _format_voltage),
+    ("/Io/AllowToCharge", True, None),
+    ("/Io/AllowToDischarge", True, None),
+    ("/Io/AllowToBalance", True, None),
+)
+
+# session bus for testing on a PC, system bus on Venus OS
+_USE_SESSION_BUS = "DBUS_SESSION_BUS_ADDRESS" in os.environ
+
+# characters not allowed in DBus paths created from battery names
+_SANITIZE_NAME_RE = re.compile(r"[^A-Za-z0-9_]+")
 
 
-class SessionBus(dbus.bus.BusConnection):
-    def __new__(cls):
-        return dbus.bus.BusConnection.__new__(cls, dbus.bus.BusConnection.TYPE_SESSION)
+def get_bus() -> dbus.bus.BusConnection:
+    # shared connection of the process, also used by the DbusMon
+    return dbus.SessionBus() if _USE_SESSION_BUS else dbus.SystemBus()
 
 
-def get_bus() -> dbus.bus.BusConnection:
-    return SessionBus() if "DBUS_SESSION_BUS_ADDRESS" in os.environ else SystemBus()
+def _atomic_write(path, text):
+    # write a temporary file and rename it, a power loss leaves either the old or the new content
+    tmpPath = path + ".tmp"
+    with open(tmpPath, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fdatasync(f.fileno())  # file data and size, mtime is not needed
+    os.replace(tmpPath, path)
+
+
+def _read_number(path, cast=float):
+    # first line of a small state file, unbuffered without the io stack
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return cast(os.read(fd, 64).split(b"\n", 1)[0].strip())
+    finally:
+        os.close(fd)
+
 
 class DbusAggBatService(object):
 
@@ -54,7 +197,20 @@ class DbusAggBatService(object):
         self._multi = None
         self._mppts_list = []
         self._smartShunt = None
-        self._searchTrials = 0
+        self._settings = None
+        # set when all required services are found and the _update loop is running
+        self._discovered = False
+        # set while a discovery run triggered by NameOwnerChanged is waiting to be executed
+        self._discoveryPending = False
+        # delay of the next discovery retry in ms, doubled after each failed search
+        self._retryDelay = DISCOVERY_RETRY_MIN
+        self._retryScheduled = False
+        # reason of the last unsuccessful search, logged if the discovery times out
+        self._missingService = None
+        # bus names shared by all _find_* methods of one discovery run
+        self._namesCache = []
+        self._namesByCategory = {}  # {"com.victronenergy.battery": [names], ...}
+        self._namesCacheTime = None  # None: not read yet
         self._readTrials = 0
         self._MaxChargeVoltage_old = 0
         self._MaxChargeCurrent_old = 0
@@ -65,7 +221,7 @@ class DbusAggBatService(object):
         logging.info("### Initialise VeDbusService ")
         self._dbusservice = VeDbusService(servicename, self._dbusConn, register=False)
         logging.info("#### Done: Init of VeDbusService ")
-        self._timeOld = tt.time()
+        self._timeOld = tt.monotonic()
         # written when dynamic CVL limit activated
         self._DCfeedActive = False
         # Set True when starting dynamic CVL reduction. Set False when balancing is finished.
@@ -78,49 +234,41 @@ class DbusAggBatService(object):
         self._dynamicCVL = False
         # measure logging period in seconds
         self._logTimer = 0
+        # sanitized DBus paths of the cell voltages {BatteryName: [paths]}
+        self._cellVoltagePaths = {}
+        # values sent to DBus in the last cycle {path: value}
+        self._lastPublished = {}
 
         # read initial charge from text file
         try:
-            self._charge_file = open(
-                "/data/dbus-aggregate-batteries/charge", "r"
-            )  # read
-            self._ownCharge = float(self._charge_file.readline().strip())
-            self._charge_file.close()
+            self._ownCharge = _read_number(CHARGE_FILE)
             self._ownCharge_old = self._ownCharge
-            logging.info(
-                "%s: Initial Ah read from file: %.0fAh"
-                % ((dt.now()).strftime("%c"), self._ownCharge)
-            )
+            self._chargeSaveTime = tt.monotonic()
+            logging.info("Initial Ah read from file: %.0fAh", self._ownCharge)
         except Exception:
-            logging.error(
-                "%s: Charge file read error. Exiting." % (dt.now()).strftime("%c")
-            )
+            logging.error("Charge file read error. Exiting.", exc_info=True)
             sys.exit()
 
+        # keep the last charge on exit, the file is updated at most once per CHARGE_SAVE_PERIOD
+        atexit.register(self._save_charge)
+
         if (
             settings.OWN_CHARGE_PARAMETERS
         ):  # read the day of the last balancing from text file
             try:
-                self._lastBalancing_file = open(
-                    "/data/dbus-aggregate-batteries/last_balancing", "r"
-                )  # read
-                self._lastBalancing = int(self._lastBalancing_file.readline().strip())
-                self._lastBalancing_file.close()
+                self._lastBalancing = _read_number(LAST_BALANCING_FILE, int)
                 time_unbalanced = (
-                    int((dt.now()).strftime("%j")) - self._lastBalancing
+                    dt.now().timetuple().tm_yday - self._lastBalancing
                 )  # in days
                 if time_unbalanced < 0:
                     time_unbalanced += 365  # year change
                 logging.info(
-                    "%s: Last balancing done at the %d. day of the year"
-                    % ((dt.now()).strftime("%c"), self._lastBalancing)
+                    "Last balancing done at the %d. day of the year",
+                    self._lastBalancing,
                 )
-                logging.info("Batteries balanced %d days ago." % time_unbalanced)
+                logging.info("Batteries balanced %d days ago.", time_unbalanced)
             except Exception:
-                logging.error(
-                    "%s: Last balancing file read error. Exiting."
-                    % (dt.now()).strftime("%c")
-                )
+                logging.error("Last balancing file read error. Exiting.", exc_info=True)
                 sys.exit()
 
         # Create the management objects, as specified in the ccgx dbus-api document
@@ -138,145 +286,172 @@ class DbusAggBatService(object):
         self._dbusservice.add_path("/Connected", 1)
         
 
-        # Create DC paths
-        self._dbusservice.add_path(
-            "/Dc/0/Voltage",
-            None,
-            writeable=True,
-            gettextcallback=lambda a, x: "{:.2f}V".format(x),
-        )
-        self._dbusservice.add_path(
-            "/Dc/0/Current",
-            None,
-            writeable=True,
-            gettextcallback=lambda a, x: "{:.2f}A".format(x),
-        )
-        self._dbusservice.add_path(
-            "/Dc/0/Power",
-            None,
-            writeable=True,
-            gettextcallback=lambda a, x: "{:.0f}W".format(x),
-        )
+        # Create DC, capacity, temperature, extras, alarm and control paths
+        for path, writeable, gettextcallback in SERVICE_PATHS:
+            self._dbusservice.add_path(
+                path, None, writeable=writeable, gettextcallback=gettextcallback
+            )
 
-        # Create capacity paths
-        self._dbusservice.add_path("/Soc", None, writeable=True)
-        self._dbusservice.add_path(
-            "/Capacity",
-            None,
-            writeable=True,
-            gettextcallback=lambda a, x: "{:.0f}Ah".format(x),
-        )
-        self._dbusservice.add_path(
-            "/InstalledCapacity",
-            None,
-            gettextcallback=lambda a, x: "{:.0f}Ah".format(x),
-        )
-        self._dbusservice.add_path(
-            "/ConsumedAmphours", None, gettextcallback=lambda a, x: "{:.0f}Ah".format(x)
-        )
+        # VeDbusService is registered in _register_service(), when the battery names
+        # for the cell voltage paths are known
 
-        # Create temperature paths
-        self._dbusservice.add_path("/Dc/0/Temperature", None, writeable=True)
-        self._dbusservice.add_path("/System/MinCellTemperature", None, writeable=True)
-        self._dbusservice.add_path("/System/MaxCellTemperature", None, writeable=True)
-
-        # Create extras paths
-        self._dbusservice.add_path(
-            "/System/MinCellVoltage",
-            None,
-            writeable=True,
-            gettextcallback=lambda a, x: "{:.3f}V".format(x),
-        )  # marvo2011
-        self._dbusservice.add_path("/System/MinVoltageCellId", None, writeable=True)
-        self._dbusservice.add_path(
-            "/System/MaxCellVoltage",
-            None,
-            writeable=True,
-            gettextcallback=lambda a, x: "{:.3f}V".format(x),
-        )  # marvo2011
-        self._dbusservice.add_path("/System/MaxVoltageCellId", None, writeable=True)
-        self._dbusservice.add_path("/System/NrOfCellsPerBattery", None, writeable=True)
-        self._dbusservice.add_path("/System/NrOfModulesOnline", None, writeable=True)
-        self._dbusservice.add_path("/System/NrOfModulesOffline", None, writeable=True)
-        self._dbusservice.add_path(
-            "/System/NrOfModulesBlockingCharge", None, writeable=True
-        )
-        self._dbusservice.add_path(
-            "/System/NrOfModulesBlockingDischarge", None, writeable=True
-        )
-        self._dbusservice.add_path(
-            "/Voltages/Sum",
-            None,
-            writeable=True,
-            gettextcallback=lambda a, x: "{:.3f}V".format(x),
-        )
-        self._dbusservice.add_path(
-            "/Voltages/Diff",
-            None,
-            writeable=True,
-            gettextcallback=lambda a, x: "{:.3f}V".format(x),
+        # discovery is driven by services appearing on the DBus instead of periodic list_names() scans
+        self._dbusConn.add_signal_receiver(
+            self._on_name_owner_changed,
+            signal_name="NameOwnerChanged",
+            dbus_interface="org.freedesktop.DBus",
+            bus_name="org.freedesktop.DBus",
         )
-        self._dbusservice.add_path("/TimeToGo", None, writeable=True)
-
-        # Create alarm paths
-        self._dbusservice.add_path("/Alarms/LowVoltage", None, writeable=True)
-        self._dbusservice.add_path("/Alarms/HighVoltage", None, writeable=True)
-        self._dbusservice.add_path("/Alarms/LowCellVoltage", None, writeable=True)
-        # self._dbusservice.add_path('/Alarms/HighCellVoltage', None, writeable=True)
-        self._dbusservice.add_path("/Alarms/LowSoc", None, writeable=True)
-        self._dbusservice.add_path("/Alarms/HighChargeCurrent", None, writeable=True)
-        self._dbusservice.add_path("/Alarms/HighDischargeCurrent", None, writeable=True)
-        self._dbusservice.add_path("/Alarms/CellImbalance", None, writeable=True)
-        self._dbusservice.add_path("/Alarms/InternalFailure", None, writeable=True)
-        self._dbusservice.add_path(
-            "/Alarms/HighChargeTemperature", None, writeable=True
+        # exit, if the required services don't appear within the search time
+        GLib.timeout_add_seconds(
+            settings.SEARCH_TRIALS * 5, self._discovery_timeout
         )
-        self._dbusservice.add_path("/Alarms/LowChargeTemperature", None, writeable=True)
-        self._dbusservice.add_path("/Alarms/HighTemperature", None, writeable=True)
-        self._dbusservice.add_path("/Alarms/LowTemperature", None, writeable=True)
-        self._dbusservice.add_path("/Alarms/BmsCable", None, writeable=True)
-
-        # Create control paths
-        self._dbusservice.add_path(
-            "/Info/MaxChargeCurrent",
-            None,
-            writeable=True,
-            gettextcallback=lambda a, x: "{:.1f}A".format(x),
-        )
-        self._dbusservice.add_path(
-            "/Info/MaxDischargeCurrent",
-            None,
-            writeable=True,
-            gettextcallback=lambda a, x: "{:.1f}A".format(x),
-        )
-        self._dbusservice.add_path(
-            "/Info/MaxChargeVoltage",
-            None,
-            writeable=True,
-            gettextcallback=lambda a, x: "{:.2f}V".format(x),
-        )
-        self._dbusservice.add_path("/Io/AllowToCharge", None, writeable=True)
-        self._dbusservice.add_path("/Io/AllowToDischarge", None, writeable=True)
-        self._dbusservice.add_path("/Io/AllowToBalance", None, writeable=True)
+
+        GLib.idle_add(self._startMonitor, servicename)
+
+    # ################################################################################################
+    # ################################################################################################
+    # ## Starting battery dbus monitor in the main loop, own AggregateBatteries service is ignored ###
+    # ################################################################################################
+    # ################################################################################################
+
+    def _startMonitor(self, servicename):
+        logging.info("Starting battery monitor.")
+        # the own service is not scanned, blocking calls to it would stall the main loop
+        self._dbusMon = DbusMon(ignoreServices=[servicename])
+        GLib.idle_add(self._discover)  # search services already present on DBus
+        return False
+
+    # ####################################################################
+    # ####################################################################
+    # ## discovery of required services, triggered by NameOwnerChanged ###
+    # ####################################################################
+    # ####################################################################
+
+    def _on_name_owner_changed(self, name, old_owner, new_owner):
+        if self._discovered or self._discoveryPending or not new_owner:
+            return
+        if name.startswith(DISCOVERY_PREFIXES):
+            logging.info("%s appeared on DBus.", name)
+            self._namesCacheTime = None  # bus names changed, read them again
+            self._discoveryPending = True
+            # give the DbusMon time to scan the new service before searching
+            GLib.timeout_add(1000, self._discover)
+
+    def _discover(self):
+        self._discoveryPending = False
+        if self._discovered:
+            return False
+
+        if not self._find_services():
+            self._schedule_retry()
+            return False
+        self._retryDelay = DISCOVERY_RETRY_MIN
+
+        # bound getter per battery, avoids resolving the service and attribute chain on every read
+        self._battery_getters = [
+            (name, functools.partial(self._dbusMon.dbusmon.get_value, service))
+            for name, service in self._batteries_dict.items()
+        ]
+
+        # services added to the Multi's DC current [(service, +1 / -1), ...]
+        self._dcCurrentServices = [(mppt, 1) for mppt in self._mppts_list]
+        if settings.DC_LOADS:
+            # SmartShunt is monitored as a battery, inverted if set so
+            self._dcCurrentServices.append(
+                (self._smartShunt, 1 if settings.INVERT_SMARTSHUNT else -1)
+            )
+
+        self._register_service()
+        self._discovered = True
+        self._timeOld = tt.monotonic()
+        GLib.timeout_add(1000, self._update)  # all found, start the _update loop
+        return False
+
+    def _register_service(self):
+        # Create voltage paths with battery names, once all batteries are known
+        if settings.SEND_CELL_VOLTAGES == 1:
+            for BatteryName in self._batteries_dict:
+                safeName = _SANITIZE_NAME_RE.sub("", BatteryName)
+                self._cellVoltagePaths[BatteryName] = []
+                for cellId in range(1, (settings.NR_OF_CELLS_PER_BATTERY) + 1):
+                    cellPath = f"/Voltages/{safeName}_Cell{cellId}"
+                    self._cellVoltagePaths[BatteryName].append(cellPath)
+                    self._dbusservice.add_path(
+                        cellPath,
+                        None,
+                        writeable=True,
+                        gettextcallback=_format_cell_voltage,
+                    )
 
         # register VeDbusService after all paths where added
         logging.info("### Registering VeDbusService")
         self._dbusservice.register()
-        
-        x = Thread(target=self._startMonitor)
-        x.start()
 
-        GLib.timeout_add(1000, self._find_settings)  # search com.victronenergy.settings
+    def _find_services(self):
+        if not self._find_settings():
+            self._missingService = "com.victronenergy.settings not found."
+            return False
+        if not self._find_batteries():
+            self._missingService = "Required number of batteries not found."
+            return False
+        if settings.CURRENT_FROM_VICTRON:
+            if not self._find_multis():
+                self._missingService = "Multi/Quattro not found."
+                return False
+            if (settings.NR_OF_MPPTS > 0) and not self._find_mppts():
+                self._missingService = "Required number of MPPTs not found."
+                return False
+        self._missingService = None
+        return True
 
-    # #############################################################################################################
-    # #############################################################################################################
-    # ## Starting battery dbus monitor in external thread (otherwise collision with AggregateBatteries service) ###
-    # #############################################################################################################
-    # #############################################################################################################
+    def _schedule_retry(self):
+        # services may be on DBus but not ready yet, search again with exponential backoff
+        if self._retryScheduled:
+            return
+        self._retryScheduled = True
+        GLib.timeout_add(self._retryDelay, self._retry_discover)
+        self._retryDelay = min(self._retryDelay * 2, DISCOVERY_RETRY_MAX)
 
-    def _startMonitor(self):
-        logging.info("%s: Starting battery monitor." % (dt.now()).strftime("%c"))
-        self._dbusMon = DbusMon()
+    def _retry_discover(self):
+        self._retryScheduled = False
+        return self._discover()
+
+    def _list_names(self):
+        # one list_names() call is shared by all searches within NAMES_CACHE_TIME
+        if (
+            self._namesCacheTime is None
+            or tt.monotonic() - self._namesCacheTime > NAMES_CACHE_TIME
+        ):
+            self._namesCache = list(self._dbusConn.list_names())
+            self._namesByCategory = {}
+            for name in self._namesCache:
+                category = ".".join(name.split(".", 3)[:3])
+                self._namesByCategory.setdefault(category, []).append(name)
+            self._namesCacheTime = tt.monotonic()
+        return self._namesCache
+
+    def _names_starting_with(self, prefix):
+        # look up the bucket of the first three name components, then filter
+        # names must start with the key word, a key word only contained in the name doesn't match
+        self._list_names()
+        category = ".".join(prefix.split(".", 3)[:3])
+        return [
+            name
+            for name in self._namesByCategory.get(category, [])
+            if name.startswith(prefix)
+        ]
+
+    def _discovery_timeout(self):
+        if self._discovered:
+            return False
+        self._discover()  # last trial
+        if not self._discovered:
+            logging.error(
+                "%s Exiting.", self._missingService or "Required services not found."
+            )
+            sys.exit()
+        return False
 
     # ####################################################################
     # ####################################################################
@@ -286,36 +461,17 @@ class DbusAggBatService(object):
     # ####################################################################
 
     def _find_settings(self):
-        logging.info(
-            "%s: Searching Settings: Trial Nr. %d"
-            % ((dt.now()).strftime("%c"), (self._searchTrials + 1))
-        )
+        if self._settings is not None:
+            return True
+        logging.info("Searching Settings.")
         try:
-            for service in self._dbusConn.list_names():
-                if "com.victronenergy.settings" in service:
-                    self._settings = service
-                    logging.info(
-                        "%s: com.victronenergy.settings found."
-                        % (dt.now()).strftime("%c")
-                    )
+            for service in self._names_starting_with("com.victronenergy.settings"):
+                self._settings = service
+                logging.info("com.victronenergy.settings found.")
         except Exception:
             pass
 
-        if self._settings is not None:
-            self._searchTrials = 0
-            GLib.timeout_add(
-                5000, self._find_batteries
-            )  # search batteries on DBus if present
-            return False  # all OK, stop calling this function
-        elif self._searchTrials < settings.SEARCH_TRIALS:
-            self._searchTrials += 1
-            return True  # next trial
-        else:
-            logging.error(
-                "%s: com.victronenergy.settings not found. Exiting."
-                % (dt.now()).strftime("%c")
-            )
-            sys.exit()
+        return self._settings is not None
 
     # ####################################################################
     # ####################################################################
@@ -324,115 +480,76 @@ class DbusAggBatService(object):
     # ####################################################################
 
     def _find_batteries(self):
+        if len(self._batteries_dict) == settings.NR_OF_BATTERIES:
+            return True
         self._batteries_dict = {}  # Marvo2011
         batteriesCount = 0
         productName = ""
-        logging.info(
-            "%s: Searching batteries: Trial Nr. %d"
-            % ((dt.now()).strftime("%c"), (self._searchTrials + 1))
-        )
+        logging.info("Searching batteries.")
         try:  # if Dbus monitor not running yet, new trial instead of exception
-            for service in self._dbusConn.list_names():
-                if "com.victronenergy" in service:
-                    logging.info("%s: Dbusmonitor sees: %s" % ((dt.now()).strftime("%c"), service))
-                if settings.BATTERY_SERVICE_NAME in service:
-                    productName = self._dbusMon.dbusmon.get_value(
-                        service, settings.BATTERY_PRODUCT_NAME_PATH
+            for service in self._names_starting_with(settings.BATTERY_SERVICE_NAME):
+                logging.info("Dbusmonitor sees: %s", service)
+                productName = self._dbusMon.dbusmon.get_value(
+                    service, settings.BATTERY_PRODUCT_NAME_PATH
+                )
+                if (productName != None) and (settings.BATTERY_PRODUCT_NAME in productName):
+                    logging.info(
+                        "Correct battery product name %s found in the service %s",
+                        productName,
+                        service,
                     )
-                    if (productName != None) and (settings.BATTERY_PRODUCT_NAME in productName):
-                        logging.info("%s: Correct battery product name %s found in the service %s" % ((dt.now()).strftime("%c"), productName, service))
-                        # Custom name, if exists, Marvo2011
-                        try:
-                            BatteryName = self._dbusMon.dbusmon.get_value(
-                                service, settings.BATTERY_INSTANCE_NAME_PATH
-                            )
-                        except Exception:
-                            BatteryName = "Battery%d" % (batteriesCount + 1)
-                        # Check if all batteries have custom names
-                        if BatteryName in self._batteries_dict:
-                            BatteryName = "%s%d" % (BatteryName, batteriesCount + 1)
-
-                        self._batteries_dict[BatteryName] = service
-                        logging.info(
-                            "%s: %s found, named as: %s."
-                            % (
-                                (dt.now()).strftime("%c"),
-                                (
-                                    self._dbusMon.dbusmon.get_value(
-                                        service, "/ProductName"
-                                    )
-                                ),
-                                BatteryName,
-                            )
+                    # Custom name, if exists, Marvo2011
+                    try:
+                        BatteryName = self._dbusMon.dbusmon.get_value(
+                            service, settings.BATTERY_INSTANCE_NAME_PATH
                         )
+                    except Exception:
+                        BatteryName = "Battery%d" % (batteriesCount + 1)
+                    # Check if all batteries have custom names
+                    if BatteryName in self._batteries_dict:
+                        BatteryName = "%s%d" % (BatteryName, batteriesCount + 1)
 
-                        batteriesCount += 1
-
-                        # Create voltage paths with battery names
-                        if settings.SEND_CELL_VOLTAGES == 1:
-                            for cellId in range(
-                                1, (settings.NR_OF_CELLS_PER_BATTERY) + 1
-                            ):
-                                self._dbusservice.add_path(
-                                    "/Voltages/%s_Cell%d"
-                                    % (
-                                        re.sub("[^A-Za-z0-9_]+", "", BatteryName),
-                                        cellId,
-                                    ),
-                                    None,
-                                    writeable=True,
-                                    gettextcallback=lambda a, x: "{:.3f}V".format(x),
-                                )
+                    self._batteries_dict[BatteryName] = service
+                    logging.info(
+                        "%s found, named as: %s.",
+                        self._dbusMon.dbusmon.get_value(service, "/ProductName"),
+                        BatteryName,
+                    )
 
-                        
-                        # Check if Nr. of cells is equal
-                        if (
-                            self._dbusMon.dbusmon.get_value(
-                                service, "/System/NrOfCellsPerBattery"
-                            )
-                            != settings.NR_OF_CELLS_PER_BATTERY
-                        ):
-                            logging.error(
-                                "%s: Number of cells of batteries is not correct. Exiting."
-                                % (dt.now()).strftime("%c")
-                            )
-                            sys.exit()
+                    batteriesCount += 1
 
-                        # end of section, Marvo2011
+                    # Check if Nr. of cells is equal
+                    if (
+                        self._dbusMon.dbusmon.get_value(
+                            service, "/System/NrOfCellsPerBattery"
+                        )
+                        != settings.NR_OF_CELLS_PER_BATTERY
+                    ):
+                        logging.error(
+                            "Number of cells of batteries is not correct. Exiting."
+                        )
+                        sys.exit()
 
-                    elif (
-                        (productName != None) and (settings.SMARTSHUNT_NAME_KEY_WORD in productName)
-                    ):  # if SmartShunt found, can be used for DC load current
-                        self._smartShunt = service
-                        logging.info("%s: Correct Smart Shunt product name %s found in the service %s" % ((dt.now()).strftime("%c"), productName, service))
+                    # end of section, Marvo2011
+
+                elif (
+                    (productName != None) and (settings.SMARTSHUNT_NAME_KEY_WORD in productName)
+                ):  # if SmartShunt found, can be used for DC load current
+                    self._smartShunt = service
+                    logging.info(
+                        "Correct Smart Shunt product name %s found in the service %s",
+                        productName,
+                        service,
+                    )
 
         except Exception:
             pass
-        logging.info(
-            "%s: %d batteries found." % ((dt.now()).strftime("%c"), batteriesCount)
-        )
+        logging.info("%d batteries found.", batteriesCount)
 
-        if batteriesCount == settings.NR_OF_BATTERIES:
-            if settings.CURRENT_FROM_VICTRON:
-                self._searchTrials = 0
-                GLib.timeout_add(
-                    1000, self._find_multis
-                )  # if current from Victron stuff search multi/quattro on DBus
-            else:
-                self._timeOld = tt.time()
-                GLib.timeout_add(
-                    1000, self._update
-                )  # if current from BMS start the _update loop
-            return False  # all OK, stop calling this function
-        elif self._searchTrials < settings.SEARCH_TRIALS:
-            self._searchTrials += 1
-            return True  # next trial
-        else:
-            logging.error(
-                "%s: Required number of batteries not found. Exiting."
-                % (dt.now()).strftime("%c")
-            )
-            sys.exit()
+        if batteriesCount != settings.NR_OF_BATTERIES:
+            self._batteries_dict = {}  # incomplete, search again on next discovery
+            return False
+        return True
 
     # #########################################################################
     # #########################################################################
@@ -441,44 +558,20 @@ class DbusAggBatService(object):
     # #########################################################################
 
     def _find_multis(self):
-        logging.info(
-            "%s: Searching Multi/Quatro VEbus: Trial Nr. %d"
-            % ((dt.now()).strftime("%c"), (self._searchTrials + 1))
-        )
+        if self._multi is not None:
+            return True
+        logging.info("Searching Multi/Quatro VEbus.")
         try:
-            for service in self._dbusConn.list_names():
-                if settings.MULTI_KEY_WORD in service:
-                    self._multi = service
-                    logging.info(
-                        "%s: %s found."
-                        % (
-                            (dt.now()).strftime("%c"),
-                            (self._dbusMon.dbusmon.get_value(service, "/ProductName")),
-                        )
-                    )
+            for service in self._names_starting_with(settings.MULTI_KEY_WORD):
+                self._multi = service
+                logging.info(
+                    "%s found.",
+                    self._dbusMon.dbusmon.get_value(service, "/ProductName"),
+                )
         except Exception:
             pass
 
-        if self._multi is not None:
-            if settings.NR_OF_MPPTS > 0:
-                self._searchTrials = 0
-                GLib.timeout_add(
-                    1000, self._find_mppts
-                )  # search MPPTs on DBus if present
-            else:
-                self._timeOld = tt.time()
-                GLib.timeout_add(
-                    1000, self._update
-                )  # if no MPPTs start the _update loop
-            return False  # all OK, stop calling this function
-        elif self._searchTrials < settings.SEARCH_TRIALS:
-            self._searchTrials += 1
-            return True  # next trial
-        else:
-            logging.error(
-                "%s: Multi/Quattro not found. Exiting." % (dt.now()).strftime("%c")
-            )
-            sys.exit()
+        return self._multi is not None
 
     # ############################################################
     # ############################################################
@@ -487,41 +580,65 @@ class DbusAggBatService(object):
     # ############################################################
 
     def _find_mppts(self):
+        if len(self._mppts_list) == settings.NR_OF_MPPTS:
+            return True
         self._mppts_list = []
         mpptsCount = 0
-        logging.info(
-            "%s: Searching MPPTs: Trial Nr. %d"
-            % ((dt.now()).strftime("%c"), (self._searchTrials + 1))
-        )
+        logging.info("Searching MPPTs.")
         try:
-            for service in self._dbusConn.list_names():
-                if settings.MPPT_KEY_WORD in service:
-                    self._mppts_list.append(service)
-                    logging.info(
-                        "%s: %s found."
-                        % (
-                            (dt.now()).strftime("%c"),
-                            (self._dbusMon.dbusmon.get_value(service, "/ProductName")),
-                        )
-                    )
-                    mpptsCount += 1
+            for service in self._names_starting_with(settings.MPPT_KEY_WORD):
+                self._mppts_list.append(service)
+                logging.info(
+                    "%s found.",
+                    self._dbusMon.dbusmon.get_value(service, "/ProductName"),
+                )
+                mpptsCount += 1
         except Exception:
             pass
 
-        logging.info("%s: %d MPPT(s) found." % ((dt.now()).strftime("%c"), mpptsCount))
-        if mpptsCount == settings.NR_OF_MPPTS:
-            self._timeOld = tt.time()
-            GLib.timeout_add(1000, self._update)
-            return False  # all OK, stop calling this function
-        elif self._searchTrials < settings.SEARCH_TRIALS:
-            self._searchTrials += 1
-            return True  # next trial
-        else:
-            logging.error(
-                "%s: Required number of MPPTs not found. Exiting."
-                % (dt.now()).strftime("%c")
-            )
-            sys.exit()
+        logging.info("%d MPPT(s) found.", mpptsCount)
+        if mpptsCount != settings.NR_OF_MPPTS:
+            self._mppts_list = []  # incomplete, search again on next discovery
+            return False
+        return True
+
+    # ######################################################################
+    # ######################################################################
+    # ## send value to DBus only if changed more than PUBLISH_TOLERANCE ###
+    # ######################################################################
+    # ######################################################################
+
+    def _publish(self, bus, path, value):
+        if path in self._lastPublished:
+            previous = self._lastPublished[path]
+            if previous == value:
+                return
+            tolerance = PUBLISH_TOLERANCE.get(path)
+            if (
+                (tolerance is not None)
+                and (previous is not None)
+                and (value is not None)
+                and (abs(value - previous) < tolerance)
+            ):
+                return
+        bus[path] = value
+        self._lastPublished[path] = value
+
+    # ######################################################################
+    # ######################################################################
+    # ## persist charge and last balancing day (flushed to flash memory) ###
+    # ######################################################################
+    # ######################################################################
+
+    def _save_charge(self):
+        if self._ownCharge == self._ownCharge_old:
+            return
+        _atomic_write(CHARGE_FILE, "%.3f" % self._ownCharge)
+        self._ownCharge_old = self._ownCharge
+        self._chargeSaveTime = tt.monotonic()
+
+    def _save_last_balancing(self):
+        _atomic_write(LAST_BALANCING_FILE, "%s" % self._lastBalancing)
 
     # #################################################################################
     # #################################################################################
@@ -545,312 +662,168 @@ class DbusAggBatService(object):
 
         # Temperature
         Temperature = 0
-        MaxCellTemp_list = []  # list, maxima of all physical batteries
-        MinCellTemp_list = []  # list, minima of all physical batteries
+        MaxCellTemp = -math.inf  # running max. of all physical batteries
+        MinCellTemp = math.inf  # running min. of all physical batteries
 
         # Extras
-        cellVoltages_dict = {}
-        MaxCellVoltage_dict = (
-            {}
-        )  # dictionary {'ID' : MaxCellVoltage, ... } for all physical batteries
-        MinCellVoltage_dict = (
-            {}
-        )  # dictionary {'ID' : MinCellVoltage, ... } for all physical batteries
+        cellVoltages_dict = {}  # {BatteryName: [cell voltages]}
+        MaxCellVoltage = -math.inf  # running max. of all physical batteries
+        maxCell = None  # (BatteryName, cell ID) of MaxCellVoltage
+        MinCellVoltage = math.inf  # running min. of all physical batteries
+        minCell = None  # (BatteryName, cell ID) of MinCellVoltage
         NrOfModulesOnline = 0
         NrOfModulesOffline = 0
         NrOfModulesBlockingCharge = 0
         NrOfModulesBlockingDischarge = 0
-        VoltagesSum_dict = {}  # battery voltages from sum of cells, Marvo2011
+        VoltagesSum = 0  # battery voltages from sum of cells, Marvo2011
         chargeVoltageReduced_list = []
 
-        # Alarms
-        LowVoltage_alarm_list = []  # lists to find maxima
-        HighVoltage_alarm_list = []
-        LowCellVoltage_alarm_list = []
-        LowSoc_alarm_list = []
-        HighChargeCurrent_alarm_list = []
-        HighDischargeCurrent_alarm_list = []
-        CellImbalance_alarm_list = []
-        InternalFailure_alarm_list = []
-        HighChargeTemperature_alarm_list = []
-        LowChargeTemperature_alarm_list = []
-        HighTemperature_alarm_list = []
-        LowTemperature_alarm_list = []
-        BmsCable_alarm_list = []
+        # Alarms, running maxima {path: alarm}
+        alarms = dict.fromkeys((path for path, _ in ALARM_PATHS), -math.inf)
 
         # Charge/discharge parameters
-        MaxChargeCurrent_list = (
-            []
+        MaxChargeCurrent = (
+            math.inf
         )  # the minimum of MaxChargeCurrent * NR_OF_BATTERIES to be transmitted
-        MaxDischargeCurrent_list = (
-            []
+        MaxDischargeCurrent = (
+            math.inf
         )  # the minimum of MaxDischargeCurrent * NR_OF_BATTERIES to be transmitted
-        MaxChargeVoltage_list = (
-            []
-        )  # if some cells are above MAX_CELL_VOLTAGE, store here the sum of differences for each battery
-        AllowToCharge_list = []  # minimum of all to be transmitted
-        AllowToDischarge_list = []  # minimum of all to be transmitted
-        AllowToBalance_list = []  # minimum of all to be transmitted
-        ChargeMode_list = []  # Bulk, Absorption, Float, Keep always max voltage
+        MaxChargeVoltageMax = -math.inf  # running max. of all max. charge voltages
+        MaxChargeVoltageMin = math.inf  # running min. of all max. charge voltages
+        AllowToCharge = math.inf  # minimum of all to be transmitted
+        AllowToDischarge = math.inf  # minimum of all to be transmitted
+        AllowToBalance = math.inf  # minimum of all to be transmitted
+        floatMode = False  # any battery in Float (Bulk, Absorption, Float, Keep always max voltage)
 
         ####################################################
         # Get DBus values from all SerialBattery instances #
         ####################################################
 
+        _max_acc = self._fn._max_acc
+        cellVoltageLimit = settings.MAX_CELL_VOLTAGE
+        _min_acc = self._fn._min_acc
+
         try:
-            for i in self._batteries_dict:  # Marvo2011
+            for i, get in self._battery_getters:  # Marvo2011
 
                 # DC
                 step = "Read V, I, P"  # to detect error
-                Voltage += self._dbusMon.dbusmon.get_value(
-                    self._batteries_dict[i], "/Dc/0/Voltage"
-                )
-                Current += self._dbusMon.dbusmon.get_value(
-                    self._batteries_dict[i], "/Dc/0/Current"
-                )
-                Power += self._dbusMon.dbusmon.get_value(
-                    self._batteries_dict[i], "/Dc/0/Power"
-                )
+                Voltage += get("/Dc/0/Voltage")
+                Current += get("/Dc/0/Current")
+                Power += get("/Dc/0/Power")
 
                 # Capacity
                 step = "Read and calculate capacity, SoC, Time to go"
-                InstalledCapacity += self._dbusMon.dbusmon.get_value(
-                    self._batteries_dict[i], "/InstalledCapacity"
-                )
+                installedCapacity = get("/InstalledCapacity")  # read once, used as weight
+                InstalledCapacity += installedCapacity
 
                 if not settings.OWN_SOC:
-                    ConsumedAmphours += self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/ConsumedAmphours"
-                    )
-                    Capacity += self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Capacity"
-                    )
-                    Soc += self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Soc"
-                    ) * self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/InstalledCapacity"
-                    )
-                    ttg = self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/TimeToGo"
-                    )
+                    ConsumedAmphours += get("/ConsumedAmphours")
+                    Capacity += get("/Capacity")
+                    Soc += get("/Soc") * installedCapacity
+                    ttg = get("/TimeToGo")
                     if (ttg is not None) and (TimeToGo is not None):
-                        TimeToGo += ttg * self._dbusMon.dbusmon.get_value(
-                            self._batteries_dict[i], "/InstalledCapacity"
-                        )
+                        TimeToGo += ttg * installedCapacity
                     else:
                         TimeToGo = None
 
                 # Temperature
                 step = "Read temperatures"
-                Temperature += self._dbusMon.dbusmon.get_value(
-                    self._batteries_dict[i], "/Dc/0/Temperature"
-                )
-                MaxCellTemp_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/System/MaxCellTemperature"
-                    )
-                )
-                MinCellTemp_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/System/MinCellTemperature"
-                    )
-                )
+                Temperature += get("/Dc/0/Temperature")
+                MaxCellTemp = _max_acc(MaxCellTemp, get("/System/MaxCellTemperature"))
+                MinCellTemp = _min_acc(MinCellTemp, get("/System/MinCellTemperature"))
 
                 # Cell voltages
                 step = "Read max. and min cell voltages and voltage sum"  # cell ID : its voltage
-                MaxCellVoltage_dict[
-                    "%s_%s"
-                    % (
-                        i,
-                        self._dbusMon.dbusmon.get_value(
-                            self._batteries_dict[i], "/System/MaxVoltageCellId"
-                        ),
-                    )
-                ] = self._dbusMon.dbusmon.get_value(
-                    self._batteries_dict[i], "/System/MaxCellVoltage"
-                )
-                MinCellVoltage_dict[
-                    "%s_%s"
-                    % (
-                        i,
-                        self._dbusMon.dbusmon.get_value(
-                            self._batteries_dict[i], "/System/MinVoltageCellId"
-                        ),
-                    )
-                ] = self._dbusMon.dbusmon.get_value(
-                    self._batteries_dict[i], "/System/MinCellVoltage"
-                )
+                # comparison with None raises an exception and a new read trial
+                batteryMaxCellVoltage = get("/System/MaxCellVoltage")
+                if batteryMaxCellVoltage > MaxCellVoltage:
+                    MaxCellVoltage = batteryMaxCellVoltage
+                    maxCell = (i, get("/System/MaxVoltageCellId"))
+                batteryMinCellVoltage = get("/System/MinCellVoltage")
+                if batteryMinCellVoltage < MinCellVoltage:
+                    MinCellVoltage = batteryMinCellVoltage
+                    minCell = (i, get("/System/MinVoltageCellId"))
 
                  # here an exception is raised and new read trial initiated if None is on Dbus
-                volt_sum_get = self._dbusMon.dbusmon.get_value(self._batteries_dict[i], "/Voltages/Sum")
+                volt_sum_get = get("/Voltages/Sum")
                 if volt_sum_get != None:
-                    VoltagesSum_dict[i] = volt_sum_get
+                    VoltagesSum += volt_sum_get
                 else:
                     raise TypeError(f"Battery {i} returns None value of /Voltages/Sum. Please check, if the setting 'BATTERY_CELL_DATA_FORMAT=1' in dbus-serialbattery config.")
 
                 # Battery state
                 step = "Read battery state"
-                NrOfModulesOnline += self._dbusMon.dbusmon.get_value(
-                    self._batteries_dict[i], "/System/NrOfModulesOnline"
-                )
-                NrOfModulesOffline += self._dbusMon.dbusmon.get_value(
-                    self._batteries_dict[i], "/System/NrOfModulesOffline"
-                )
-                NrOfModulesBlockingCharge += self._dbusMon.dbusmon.get_value(
-                    self._batteries_dict[i], "/System/NrOfModulesBlockingCharge"
-                )
-                NrOfModulesBlockingDischarge += self._dbusMon.dbusmon.get_value(
-                    self._batteries_dict[i], "/System/NrOfModulesBlockingDischarge"
+                NrOfModulesOnline += get("/System/NrOfModulesOnline")
+                NrOfModulesOffline += get("/System/NrOfModulesOffline")
+                NrOfModulesBlockingCharge += get("/System/NrOfModulesBlockingCharge")
+                NrOfModulesBlockingDischarge += get(
+                    "/System/NrOfModulesBlockingDischarge"
                 )  # sum of modules blocking discharge
 
                 step = "Read cell voltages"
-                for j in range(settings.NR_OF_CELLS_PER_BATTERY):  # Marvo2011
-                    cellVoltages_dict["%s_Cell%d" % (i, j + 1)] = (
-                        self._dbusMon.dbusmon.get_value(
-                            self._batteries_dict[i], "/Voltages/Cell%d" % (j + 1)
-                        )
-                    )
+                # read once per cycle, reused for the CVL reduction
+                batteryCells = [get(path) for path in CELL_VOLTAGE_PATHS]
+                cellVoltages_dict[i] = batteryCells  # Marvo2011
 
                 # Alarms
                 step = "Read alarms"
-                LowVoltage_alarm_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Alarms/LowVoltage"
-                    )
-                )
-                HighVoltage_alarm_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Alarms/HighVoltage"
-                    )
-                )
-                LowCellVoltage_alarm_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Alarms/LowCellVoltage"
-                    )
-                )
-                LowSoc_alarm_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Alarms/LowSoc"
-                    )
-                )
-                HighChargeCurrent_alarm_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Alarms/HighChargeCurrent"
-                    )
-                )
-                HighDischargeCurrent_alarm_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Alarms/HighDischargeCurrent"
-                    )
-                )
-                CellImbalance_alarm_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Alarms/CellImbalance"
-                    )
-                )
-                InternalFailure_alarm_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Alarms/InternalFailure_alarm"
-                    )
-                )
-                HighChargeTemperature_alarm_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Alarms/HighChargeTemperature"
-                    )
-                )
-                LowChargeTemperature_alarm_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Alarms/LowChargeTemperature"
-                    )
-                )
-                HighTemperature_alarm_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Alarms/HighTemperature"
-                    )
-                )
-                LowTemperature_alarm_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Alarms/LowTemperature"
-                    )
-                )
-                BmsCable_alarm_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Alarms/BmsCable"
-                    )
-                )
+                for path, batteryPath in ALARM_PATHS:
+                    alarms[path] = _max_acc(alarms[path], get(batteryPath))
 
                 if (
                     settings.OWN_CHARGE_PARAMETERS
                 ):  # calculate reduction of charge voltage as sum of overvoltages of all cells
                     step = "Calculate CVL reduction"
-                    cellOvervoltage = 0
-                    for j in range(settings.NR_OF_CELLS_PER_BATTERY):  # Marvo2011
-                        cellVoltage = self._dbusMon.dbusmon.get_value(
-                            self._batteries_dict[i], "/Voltages/Cell%d" % (j + 1)
+                    # a missing cell voltage starts a new read trial, also if the shortcut below is taken
+                    if None in batteryCells:
+                        raise TypeError(f"Battery {i} returns None value of a cell voltage.")
+                    if batteryMaxCellVoltage > cellVoltageLimit:
+                        cellOvervoltage = sum(  # Marvo2011
+                            cellVoltage - cellVoltageLimit
+                            for cellVoltage in batteryCells
+                            if cellVoltage > cellVoltageLimit
                         )
-                        if cellVoltage > settings.MAX_CELL_VOLTAGE:
-                            cellOvervoltage += cellVoltage - settings.MAX_CELL_VOLTAGE
-                    chargeVoltageReduced_list.append(
-                        VoltagesSum_dict[i] - cellOvervoltage
-                    )
+                    else:  # no cell of this battery above the limit
+                        cellOvervoltage = 0
+                    chargeVoltageReduced_list.append(volt_sum_get - cellOvervoltage)
 
                 else:  # Aggregate charge/discharge parameters
                     step = "Read charge parameters"
-                    MaxChargeCurrent_list.append(
-                        self._dbusMon.dbusmon.get_value(
-                            self._batteries_dict[i], "/Info/MaxChargeCurrent"
-                        )
-                    )  # list of max. charge currents to find minimum
-                    MaxDischargeCurrent_list.append(
-                        self._dbusMon.dbusmon.get_value(
-                            self._batteries_dict[i], "/Info/MaxDischargeCurrent"
-                        )
-                    )  # list of max. discharge currents  to find minimum
-                    MaxChargeVoltage_list.append(
-                        self._dbusMon.dbusmon.get_value(
-                            self._batteries_dict[i], "/Info/MaxChargeVoltage"
-                        )
-                    )  # list of max. charge voltages  to find minimum
-                    ChargeMode_list.append(
-                        self._dbusMon.dbusmon.get_value(
-                            self._batteries_dict[i], "/Info/ChargeMode"
-                        )
-                    )  # list of charge modes of batteries (Bulk, Absorption, Float, Keep always max voltage)
+                    MaxChargeCurrent = _min_acc(
+                        MaxChargeCurrent, get("/Info/MaxChargeCurrent")
+                    )  # minimum of max. charge currents
+                    MaxDischargeCurrent = _min_acc(
+                        MaxDischargeCurrent, get("/Info/MaxDischargeCurrent")
+                    )  # minimum of max. discharge currents
+                    batteryMaxChargeVoltage = get("/Info/MaxChargeVoltage")
+                    MaxChargeVoltageMax = _max_acc(
+                        MaxChargeVoltageMax, batteryMaxChargeVoltage
+                    )  # both kept, KEEP_MAX_CVL decides after the loop
+                    MaxChargeVoltageMin = _min_acc(
+                        MaxChargeVoltageMin, batteryMaxChargeVoltage
+                    )
+                    if get("/Info/ChargeMode") == "Float":
+                        floatMode = True
 
                 step = "Read Allow to"
-                AllowToCharge_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Io/AllowToCharge"
-                    )
-                )  # list of AllowToCharge to find minimum
-                AllowToDischarge_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Io/AllowToDischarge"
-                    )
-                )  # list of AllowToDischarge to find minimum
-                AllowToBalance_list.append(
-                    self._dbusMon.dbusmon.get_value(
-                        self._batteries_dict[i], "/Io/AllowToBalance"
-                    )
-                )  # list of AllowToBalance to find minimum
+                AllowToCharge = _min_acc(AllowToCharge, get("/Io/AllowToCharge"))
+                AllowToDischarge = _min_acc(
+                    AllowToDischarge, get("/Io/AllowToDischarge")
+                )
+                AllowToBalance = _min_acc(AllowToBalance, get("/Io/AllowToBalance"))
 
-            step = "Find max. and min. cell voltage of all batteries"
-            # placed in try-except structure for the case if some values are of None.
-            # The _max() and _min() don't work with dictionaries
-            MaxVoltageCellId = max(MaxCellVoltage_dict, key=MaxCellVoltage_dict.get)
-            MaxCellVoltage = MaxCellVoltage_dict[MaxVoltageCellId]
-            MinVoltageCellId = min(MinCellVoltage_dict, key=MinCellVoltage_dict.get)
-            MinCellVoltage = MinCellVoltage_dict[MinVoltageCellId]
+            # 'ID' strings are formatted only for the extreme cells of all batteries
+            MaxVoltageCellId = "%s_%s" % maxCell
+            MinVoltageCellId = "%s_%s" % minCell
 
         except Exception as err:
             self._readTrials += 1
-            logging.error("%s: Error: %s." % ((dt.now()).strftime("%c"), err))
-            logging.error("Occured during step %s, Battery %s." % (step, i))
-            logging.error("Read trial nr. %d" % self._readTrials)
+            logging.error("Error: %s.", err)
+            logging.error("Occured during step %s, Battery %s.", step, i)
+            logging.error("Read trial nr. %d", self._readTrials)
             if self._readTrials > settings.READ_TRIALS:
-                logging.error(
-                    "%s: DBus read failed. Exiting." % (dt.now()).strftime("%c")
-                )
+                logging.error("DBus read failed. Exiting.")
                 sys.exit()
             else:
                 return True  # next call allowed
@@ -864,72 +837,35 @@ class DbusAggBatService(object):
         # averaging
         Voltage = Voltage / settings.NR_OF_BATTERIES
         Temperature = Temperature / settings.NR_OF_BATTERIES
-        VoltagesSum = (
-            sum(VoltagesSum_dict.values()) / settings.NR_OF_BATTERIES
-        )  # Marvo2011
-
-        # find max and min cell temperature (have no ID)
-        MaxCellTemp = self._fn._max(MaxCellTemp_list)
-        MinCellTemp = self._fn._min(MinCellTemp_list)
-
-        # find max in alarms
-        LowVoltage_alarm = self._fn._max(LowVoltage_alarm_list)
-        HighVoltage_alarm = self._fn._max(HighVoltage_alarm_list)
-        LowCellVoltage_alarm = self._fn._max(LowCellVoltage_alarm_list)
-        LowSoc_alarm = self._fn._max(LowSoc_alarm_list)
-        HighChargeCurrent_alarm = self._fn._max(HighChargeCurrent_alarm_list)
-        HighDischargeCurrent_alarm = self._fn._max(HighDischargeCurrent_alarm_list)
-        CellImbalance_alarm = self._fn._max(CellImbalance_alarm_list)
-        InternalFailure_alarm = self._fn._max(InternalFailure_alarm_list)
-        HighChargeTemperature_alarm = self._fn._max(HighChargeTemperature_alarm_list)
-        LowChargeTemperature_alarm = self._fn._max(LowChargeTemperature_alarm_list)
-        HighTemperature_alarm = self._fn._max(HighTemperature_alarm_list)
-        LowTemperature_alarm = self._fn._max(LowTemperature_alarm_list)
-        BmsCable_alarm = self._fn._max(BmsCable_alarm_list)
+        VoltagesSum = VoltagesSum / settings.NR_OF_BATTERIES  # Marvo2011
 
         # find max. charge voltage (if needed)
         if not settings.OWN_CHARGE_PARAMETERS:
-            if settings.KEEP_MAX_CVL and ("Float" in ChargeMode_list):
-                MaxChargeVoltage = self._fn._max(MaxChargeVoltage_list)
-                    
+            if settings.KEEP_MAX_CVL and floatMode:
+                MaxChargeVoltage = MaxChargeVoltageMax
             else:
-                MaxChargeVoltage = self._fn._min(MaxChargeVoltage_list)
-                
-            MaxChargeCurrent = (
-                self._fn._min(MaxChargeCurrent_list) * settings.NR_OF_BATTERIES
-            )
-            
-            MaxDischargeCurrent = (
-                self._fn._min(MaxDischargeCurrent_list) * settings.NR_OF_BATTERIES
-            )
+                MaxChargeVoltage = MaxChargeVoltageMin
 
-        AllowToCharge = self._fn._min(AllowToCharge_list)
-        AllowToDischarge = self._fn._min(AllowToDischarge_list)
-        AllowToBalance = self._fn._min(AllowToBalance_list)
+            if MaxChargeCurrent is not None:
+                MaxChargeCurrent *= settings.NR_OF_BATTERIES
+
+            if MaxDischargeCurrent is not None:
+                MaxDischargeCurrent *= settings.NR_OF_BATTERIES
 
         ####################################
         # Measure current by Victron stuff #
         ####################################
 
         if settings.CURRENT_FROM_VICTRON:
+            get_value = self._dbusMon.dbusmon.get_value
             try:
-                Current_VE = self._dbusMon.dbusmon.get_value(
+                Current_VE = get_value(
                     self._multi, "/Dc/0/Current"
                 )  # get DC current of multi/quattro (or system of them)
-                for i in range(settings.NR_OF_MPPTS):
-                    Current_VE += self._dbusMon.dbusmon.get_value(
-                        self._mppts_list[i], "/Dc/0/Current"
-                    )  # add DC current of all MPPTs (if present)
-
-                if settings.DC_LOADS:
-                    if settings.INVERT_SMARTSHUNT:
-                        Current_VE += self._dbusMon.dbusmon.get_value(
-                            self._smartShunt, "/Dc/0/Current"
-                        )  # SmartShunt is monitored as a battery
-                    else:
-                        Current_VE -= self._dbusMon.dbusmon.get_value(
-                            self._smartShunt, "/Dc/0/Current"
-                        )
+                for service, sign in self._dcCurrentServices:
+                    Current_VE += sign * get_value(
+                        service, "/Dc/0/Current"
+                    )  # add DC current of all MPPTs and SmartShunt (if present)
 
                 if Current_VE is not None:
                     Current = Current_VE  # BMS current overwritten only if no exception raised
@@ -938,14 +874,12 @@ class DbusAggBatService(object):
                     )  # calculate own power (not read from BMS)
                 else:
                     logging.error(
-                        "%s: Victron current is None. Using BMS current and power instead."
-                        % (dt.now()).strftime("%c")
+                        "Victron current is None. Using BMS current and power instead."
                     )  # the BMS values are not overwritten
 
             except Exception:
                 logging.error(
-                    "%s: Victron current read error. Using BMS current and power instead."
-                    % (dt.now()).strftime("%c")
+                    "Victron current read error. Using BMS current and power instead."
                 )  # the BMS values are not overwritten
 
         ####################################################################################################
@@ -953,18 +887,17 @@ class DbusAggBatService(object):
         ####################################################################################################
 
         if settings.OWN_CHARGE_PARAMETERS:
+            today = dt.now().timetuple()  # month and day of the year without strftime
             CVL_NORMAL = (
                 settings.NR_OF_CELLS_PER_BATTERY
-                * settings.CHARGE_VOLTAGE_LIST[int((dt.now()).strftime("%m")) - 1]
+                * settings.CHARGE_VOLTAGE_LIST[today.tm_mon - 1]
             )
             CVL_BALANCING = (
                 settings.NR_OF_CELLS_PER_BATTERY * settings.BALANCING_VOLTAGE
             )
             ChargeVoltageBattery = CVL_NORMAL
 
-            time_unbalanced = (
-                int((dt.now()).strftime("%j")) - self._lastBalancing
-            )  # in days
+            time_unbalanced = today.tm_yday - self._lastBalancing  # in days
             if time_unbalanced < 0:
                 time_unbalanced += 365  # year change
 
@@ -976,10 +909,7 @@ class DbusAggBatService(object):
                     time_unbalanced >= settings.BALANCING_REPETITION
                 ):
                     self._balancing = 1  # activate increased CVL for balancing
-                    logging.info(
-                        "%s: CVL increase for balancing activated."
-                        % (dt.now()).strftime("%c")
-                    )
+                    logging.info("CVL increase for balancing activated.")
 
                 if self._balancing == 1:
                     ChargeVoltageBattery = CVL_BALANCING
@@ -987,25 +917,16 @@ class DbusAggBatService(object):
                         (MaxCellVoltage - MinCellVoltage) < settings.CELL_DIFF_MAX
                     ):
                         self._balancing = 2
-                        logging.info(
-                            "%s: Balancing goal reached." % (dt.now()).strftime("%c")
-                        )
+                        logging.info("Balancing goal reached.")
 
                 if self._balancing >= 2:
                     # keep balancing voltage at balancing day until decrease of solar powers and
                     ChargeVoltageBattery = CVL_BALANCING
                     if Voltage <= CVL_NORMAL:  # the charge above "normal" is consumed
                         self._balancing = 0
-                        self._lastBalancing = int((dt.now()).strftime("%j"))
-                        self._lastBalancing_file = open(
-                            "/data/dbus-aggregate-batteries/last_balancing", "w"
-                        )
-                        self._lastBalancing_file.write("%s" % self._lastBalancing)
-                        self._lastBalancing_file.close()
-                        logging.info(
-                            "%s: CVL increase for balancing de-activated."
-                            % (dt.now()).strftime("%c")
-                        )
+                        self._lastBalancing = today.tm_yday
+                        self._save_last_balancing()
+                        logging.info("CVL increase for balancing de-activated.")
 
                 if self._balancing == 0:
                     ChargeVoltageBattery = CVL_NORMAL
@@ -1016,15 +937,10 @@ class DbusAggBatService(object):
                 and ((MaxCellVoltage - MinCellVoltage) < settings.CELL_DIFF_MAX)
             ):  # if normal charging voltage is 100% SoC and balancing is finished
                 logging.info(
-                    "%s: Balancing goal reached with full charging set as normal. Updating last_balancing file."
-                    % (dt.now()).strftime("%c")
+                    "Balancing goal reached with full charging set as normal. Updating last_balancing file."
                 )
-                self._lastBalancing = int((dt.now()).strftime("%j"))
-                self._lastBalancing_file = open(
-                    "/data/dbus-aggregate-batteries/last_balancing", "w"
-                )
-                self._lastBalancing_file.write("%s" % self._lastBalancing)
-                self._lastBalancing_file.close()
+                self._lastBalancing = today.tm_yday
+                self._save_last_balancing()
 
             if Voltage >= CVL_BALANCING:
                 self._ownCharge = InstalledCapacity  # reset Coulumb counter to 100%
@@ -1034,7 +950,9 @@ class DbusAggBatService(object):
                 if not self._dynamicCVL: 
                     self._dynamicCVL = True
                     logging.info(
-                        f"{(dt.now()).strftime('%c')}: Dynamic CVL reduction started due to max. cell voltage: {MaxVoltageCellId} {MaxCellVoltage:.3f}V."
+                        "Dynamic CVL reduction started due to max. cell voltage: %s %.3fV.",
+                        MaxVoltageCellId,
+                        MaxCellVoltage,
                     )
                     if not self._dynCVLactivated:       # avoid periodic readout  
                         self._dynCVLactivated = True
@@ -1043,18 +961,15 @@ class DbusAggBatService(object):
                             "/Settings/CGwacs/OvervoltageFeedIn",
                         )  # check if DC-feed enabled
 
-                        self._dbusMon.dbusmon.set_value(
-                            "com.victronenergy.settings",
-                            "/Settings/CGwacs/OvervoltageFeedIn",
-                            0,
-                        )  # disable DC-coupled PV feed-in
-                    
-                        if (self._DCfeedActive == 0):
-                            logging.info(
-                                f"{(dt.now()).strftime('%c')}: DC-coupled PV feed-in was not active.")
-                        else:    
-                            logging.info(
-                                f"{(dt.now()).strftime('%c')}: DC-coupled PV feed-in de-activated.")
+                        if (self._DCfeedActive == 0):  # nothing to write
+                            logging.info("DC-coupled PV feed-in was not active.")
+                        else:
+                            self._dbusMon.dbusmon.set_value(
+                                "com.victronenergy.settings",
+                                "/Settings/CGwacs/OvervoltageFeedIn",
+                                0,
+                            )  # disable DC-coupled PV feed-in
+                            logging.info("DC-coupled PV feed-in de-activated.")
  
                 MaxChargeVoltage = min(
                     (min(chargeVoltageReduced_list)), ChargeVoltageBattery
@@ -1065,20 +980,21 @@ class DbusAggBatService(object):
 
                 if self._dynamicCVL:
                     self._dynamicCVL = False
-                    logging.info(
-                        "%s: Dynamic CVL reduction finished."
-                        % (dt.now()).strftime("%c")
-                    )
+                    logging.info("Dynamic CVL reduction finished.")
                     if (MaxCellVoltage - MinCellVoltage) < settings.CELL_DIFF_MAX:
-                        self._dbusMon.dbusmon.set_value(
-                            "com.victronenergy.settings",
-                            "/Settings/CGwacs/OvervoltageFeedIn",
-                            self._DCfeedActive,
-                        )  # re-enable DC-feed if it was enabled before
                         if self._DCfeedActive:
-                            logging.info(f"{(dt.now()).strftime('%c')}: DC-coupled PV feed-in re-activated after succeeded balancing.")
+                            self._dbusMon.dbusmon.set_value(
+                                "com.victronenergy.settings",
+                                "/Settings/CGwacs/OvervoltageFeedIn",
+                                self._DCfeedActive,
+                            )  # re-enable DC-feed if it was enabled before
+                            logging.info(
+                                "DC-coupled PV feed-in re-activated after succeeded balancing."
+                            )
                         else:
-                            logging.info(f"{(dt.now()).strftime('%c')}: DC-coupled PV feed-in was not active before and was not activated.")
+                            logging.info(
+                                "DC-coupled PV feed-in was not active before and was not activated."
+                            )
                         
                         # reset to prevent permanent logging and activation of  /Settings/CGwacs/OvervoltageFeedIn
                         self._DCfeedActive = False
@@ -1122,8 +1038,9 @@ class DbusAggBatService(object):
         # own Coulomb counter (runs even the BMS values are used) #
         ###########################################################
 
-        deltaTime = tt.time() - self._timeOld
-        self._timeOld = tt.time()
+        timeNow = tt.monotonic()  # not affected by clock steps (NTP, GPS)
+        deltaTime = timeNow - self._timeOld
+        self._timeOld = timeNow
         if Current > 0:
             self._ownCharge += (
                 Current * (deltaTime / 3600) * settings.BATTERY_EFFICIENCY
@@ -1134,13 +1051,13 @@ class DbusAggBatService(object):
         self._ownCharge = min(self._ownCharge, InstalledCapacity)
 
         # store the charge into text file if changed significantly (avoid frequent file access)
-        if abs(self._ownCharge - self._ownCharge_old) >= (
-            settings.CHARGE_SAVE_PRECISION * InstalledCapacity
+        if (
+            abs(self._ownCharge - self._ownCharge_old)
+            >= (settings.CHARGE_SAVE_PRECISION * InstalledCapacity)
+        ) and (
+            tt.monotonic() - self._chargeSaveTime >= CHARGE_SAVE_PERIOD
         ):
-            self._charge_file = open("/data/dbus-aggregate-batteries/charge", "w")
-            self._charge_file.write("%.3f" % self._ownCharge)
-            self._charge_file.close()
-            self._ownCharge_old = self._ownCharge
+            self._save_charge()
 
         # overwrite BMS charge values
         if settings.OWN_SOC:
@@ -1168,66 +1085,64 @@ class DbusAggBatService(object):
         with self._dbusservice as bus:
 
             # send DC
-            bus["/Dc/0/Voltage"] = Voltage  # round(Voltage, 2)
-            bus["/Dc/0/Current"] = Current  # round(Current, 1)
-            bus["/Dc/0/Power"] = Power  # round(Power, 0)
+            self._publish(bus, "/Dc/0/Voltage", Voltage)  # round(Voltage, 2)
+            self._publish(bus, "/Dc/0/Current", Current)  # round(Current, 1)
+            self._publish(bus, "/Dc/0/Power", Power)  # round(Power, 0)
 
             # send charge
-            bus["/Soc"] = Soc
-            bus["/TimeToGo"] = TimeToGo
-            bus["/Capacity"] = Capacity
-            bus["/InstalledCapacity"] = InstalledCapacity
-            bus["/ConsumedAmphours"] = ConsumedAmphours
+            self._publish(bus, "/Soc", Soc)
+            self._publish(bus, "/TimeToGo", TimeToGo)
+            self._publish(bus, "/Capacity", Capacity)
+            self._publish(bus, "/InstalledCapacity", InstalledCapacity)
+            self._publish(bus, "/ConsumedAmphours", ConsumedAmphours)
 
             # send temperature
-            bus["/Dc/0/Temperature"] = Temperature
-            bus["/System/MaxCellTemperature"] = MaxCellTemp
-            bus["/System/MinCellTemperature"] = MinCellTemp
+            self._publish(bus, "/Dc/0/Temperature", Temperature)
+            self._publish(bus, "/System/MaxCellTemperature", MaxCellTemp)
+            self._publish(bus, "/System/MinCellTemperature", MinCellTemp)
 
             # send cell voltages
-            bus["/System/MaxCellVoltage"] = MaxCellVoltage
-            bus["/System/MaxVoltageCellId"] = MaxVoltageCellId
-            bus["/System/MinCellVoltage"] = MinCellVoltage
-            bus["/System/MinVoltageCellId"] = MinVoltageCellId
-            bus["/Voltages/Sum"] = VoltagesSum
-            bus["/Voltages/Diff"] = round(
-                MaxCellVoltage - MinCellVoltage, 3
+            self._publish(bus, "/System/MaxCellVoltage", MaxCellVoltage)
+            self._publish(bus, "/System/MaxVoltageCellId", MaxVoltageCellId)
+            self._publish(bus, "/System/MinCellVoltage", MinCellVoltage)
+            self._publish(bus, "/System/MinVoltageCellId", MinVoltageCellId)
+            self._publish(bus, "/Voltages/Sum", VoltagesSum)
+            self._publish(
+                bus, "/Voltages/Diff", round(MaxCellVoltage - MinCellVoltage, 3)
             )  # Marvo2011
 
             if settings.SEND_CELL_VOLTAGES == 1:  # Marvo2011
-                for cellId, currentCell in enumerate(cellVoltages_dict):
-                    bus[
-                        "/Voltages/%s" % (re.sub("[^A-Za-z0-9_]+", "", currentCell))
-                    ] = cellVoltages_dict[currentCell]
+                for BatteryName, batteryCells in cellVoltages_dict.items():
+                    for path, cellVoltage in zip(
+                        self._cellVoltagePaths[BatteryName], batteryCells
+                    ):
+                        self._publish(bus, path, cellVoltage)
 
             # send battery state
-            bus["/System/NrOfCellsPerBattery"] = settings.NR_OF_CELLS_PER_BATTERY
-            bus["/System/NrOfModulesOnline"] = NrOfModulesOnline
-            bus["/System/NrOfModulesOffline"] = NrOfModulesOffline
-            bus["/System/NrOfModulesBlockingCharge"] = NrOfModulesBlockingCharge
-            bus["/System/NrOfModulesBlockingDischarge"] = NrOfModulesBlockingDischarge
+            self._publish(
+                bus, "/System/NrOfCellsPerBattery", settings.NR_OF_CELLS_PER_BATTERY
+            )
+            self._publish(bus, "/System/NrOfModulesOnline", NrOfModulesOnline)
+            self._publish(bus, "/System/NrOfModulesOffline", NrOfModulesOffline)
+            self._publish(
+                bus, "/System/NrOfModulesBlockingCharge", NrOfModulesBlockingCharge
+            )
+            self._publish(
+                bus,
+                "/System/NrOfModulesBlockingDischarge",
+                NrOfModulesBlockingDischarge,
+            )
 
             # send alarms
-            bus["/Alarms/LowVoltage"] = LowVoltage_alarm
-            bus["/Alarms/HighVoltage"] = HighVoltage_alarm
-            bus["/Alarms/LowCellVoltage"] = LowCellVoltage_alarm
             # bus['/Alarms/HighCellVoltage'] = HighCellVoltage_alarm   # not implemended in Venus
-            bus["/Alarms/LowSoc"] = LowSoc_alarm
-            bus["/Alarms/HighChargeCurrent"] = HighChargeCurrent_alarm
-            bus["/Alarms/HighDischargeCurrent"] = HighDischargeCurrent_alarm
-            bus["/Alarms/CellImbalance"] = CellImbalance_alarm
-            bus["/Alarms/InternalFailure"] = InternalFailure_alarm
-            bus["/Alarms/HighChargeTemperature"] = HighChargeTemperature_alarm
-            bus["/Alarms/LowChargeTemperature"] = LowChargeTemperature_alarm
-            bus["/Alarms/HighTemperature"] = HighTemperature_alarm
-            bus["/Alarms/LowTemperature"] = LowTemperature_alarm
-            bus["/Alarms/BmsCable"] = BmsCable_alarm
+            for path, _ in ALARM_PATHS:
+                self._publish(bus, path, alarms[path])
 
             # send charge/discharge control
 
-            bus["/Info/MaxChargeCurrent"] = MaxChargeCurrent
-            bus["/Info/MaxDischargeCurrent"] = MaxDischargeCurrent
-            bus["/Info/MaxChargeVoltage"] = MaxChargeVoltage
+            self._publish(bus, "/Info/MaxChargeCurrent", MaxChargeCurrent)
+            self._publish(bus, "/Info/MaxDischargeCurrent", MaxDischargeCurrent)
+            self._publish(bus, "/Info/MaxChargeVoltage", MaxChargeVoltage)
 
             """
             # Not working, Serial Battery disapears regardles BLOCK_ON_DISCONNECT is True or False
@@ -1239,13 +1154,13 @@ class DbusAggBatService(object):
                 bus['/Info/MaxChargeCurrent'] = 0
                 bus['/Info/MaxDischargeCurrent'] = 0
                 bus['/Info/MaxChargeVoltage'] = NR_OF_CELLS_PER_BATTERY * min(CHARGE_VOLTAGE_LIST)
-                logging.error('%s: BMS connection lost.' % (dt.now()).strftime('%c'))
+                logging.error('BMS connection lost.')
             """
 
             # this does not control the charger, is only displayed in GUI
-            bus["/Io/AllowToCharge"] = AllowToCharge
-            bus["/Io/AllowToDischarge"] = AllowToDischarge
-            bus["/Io/AllowToBalance"] = AllowToBalance
+            self._publish(bus, "/Io/AllowToCharge", AllowToCharge)
+            self._publish(bus, "/Io/AllowToDischarge", AllowToDischarge)
+            self._publish(bus, "/Io/AllowToBalance", AllowToBalance)
 
         # ##########################################################
         # ################ Periodic logging ########################
@@ -1256,24 +1171,27 @@ class DbusAggBatService(object):
                 self._logTimer += 1
             else:
                 self._logTimer = 0
-                logging.info("%s: Repetitive logging:" % dt.now().strftime("%c"))
+                logging.info("Repetitive logging:")
                 logging.info(
-                    "  CVL: %.1fV, CCL: %.0fA, DCL: %.0fA"
-                    % (MaxChargeVoltage, MaxChargeCurrent, MaxDischargeCurrent)
+                    "  CVL: %.1fV, CCL: %.0fA, DCL: %.0fA",
+                    MaxChargeVoltage,
+                    MaxChargeCurrent,
+                    MaxDischargeCurrent,
                 )
                 logging.info(
-                    "  Bat. voltage: %.1fV, Bat. current: %.0fA, SoC: %.1f%%, Balancing state: %d"
-                    % (Voltage, Current, Soc, self._balancing)
+                    "  Bat. voltage: %.1fV, Bat. current: %.0fA, SoC: %.1f%%, Balancing state: %d",
+                    Voltage,
+                    Current,
+                    Soc,
+                    self._balancing,
                 )
                 logging.info(
-                    "  Min. cell voltage: %s: %.3fV, Max. cell voltage: %s: %.3fV, difference: %.3fV"
-                    % (
-                        MinVoltageCellId,
-                        MinCellVoltage,
-                        MaxVoltageCellId,
-                        MaxCellVoltage,
-                        MaxCellVoltage - MinCellVoltage,
-                    )
+                    "  Min. cell voltage: %s: %.3fV, Max. cell voltage: %s: %.3fV, difference: %.3fV",
+                    MinVoltageCellId,
+                    MinCellVoltage,
+                    MaxVoltageCellId,
+                    MaxCellVoltage,
+                    MaxCellVoltage - MinCellVoltage,
                 )
 
         return True
@@ -1288,19 +1206,23 @@ class DbusAggBatService(object):
 
 def main():
 
-    logging.basicConfig(level=logging.INFO)
-    logging.info("%s: Starting AggregateBatteries." % (dt.now()).strftime("%c"))
+    # same line format as the former "%s: ..." % dt.now().strftime("%c") messages
+    logging.basicConfig(
+        format="%(levelname)s:%(name)s:%(asctime)s: %(message)s",
+        datefmt="%c",
+        level=logging.INFO,
+    )
+    logging.info("Starting AggregateBatteries.")
     from dbus.mainloop.glib import DBusGMainLoop
 
     DBusGMainLoop(set_as_default=True)
 
     DbusAggBatService()
 
-    logging.info(
-        "%s: Connected to DBus, and switching over to GLib.MainLoop()"
-        % (dt.now()).strftime("%c")
-    )
+    logging.info("Connected to DBus, and switching over to GLib.MainLoop()")
     mainloop = GLib.MainLoop()
+    # leave the main loop on SIGTERM (restart.sh, svc -d), so that the charge is saved on exit
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGTERM, mainloop.quit)
     mainloop.run()
 
 
@@ -11,7 +11,7 @@ from dbus.mainloop.glib import DBusGMainLoop  # noqa: E402
 
 
 class DbusMon:
-    def __init__(self):
+    def __init__(self, ignoreServices=None):
         dummy = {"code": None, "whenToLog": "configChange", "accessLevel": None}
         self.monitorlist = {
             "com.victronenergy.battery": {
@@ -109,11 +109,13 @@ class DbusMon:
             },
         }
 
-        self.dbusmon = DbusMonitor(self.monitorlist)
+        self.dbusmon = DbusMonitor(
+            self.monitorlist, ignoreServices=(ignoreServices or [])
+        )
 
     def print_values(self, service, mon_list):
         for path in self.monitorlist[mon_list]:
-            logging.info("%s: %s" % (path, self.dbusmon.get_value(service, path)))
+            logging.info("%s: %s", path, self.dbusmon.get_value(service, path))
         logging.info("\n")
         return True
 
@@ -2,6 +2,7 @@
 
 import sys
 import logging
+from bisect import bisect_left
 
 
 class Functions:
@@ -21,6 +22,21 @@ class Functions:
         except Exception:
             return None
 
+    # Exception safe running max and min, start with -inf or inf,
+    # once a None value was accumulated the result stays None
+
+    def _max_acc(self, acc, x):
+        try:
+            return max(acc, x)
+        except Exception:
+            return None
+
+    def _min_acc(self, acc, x):
+        try:
+            return min(acc, x)
+        except Exception:
+            return None
+
     # Interpolate f(x) if given lists Y = f(X)
 
     def _interpolate(self, X, Y, x):
@@ -31,9 +47,8 @@ class Functions:
             elif x >= X[_len - 1]:
                 return Y[_len - 1]
             else:
-                for i in range(_len - 1):
-                    if x <= X[i + 1]:
-                        return Y[i] + (Y[i + 1] - Y[i]) / (X[i + 1] - X[i]) * (x - X[i])
+                i = bisect_left(X, x, 1) - 1  # first X[i + 1] >= x, X is ascending
+                return Y[i] + (Y[i + 1] - Y[i]) / (X[i + 1] - X[i]) * (x - X[i])
         else:
             logging.error("Both lists must have the same length. Exiting.")
             sys.exit()
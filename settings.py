@@ -19,6 +19,8 @@ INVERT_SMARTSHUNT = False
 # ########### DBus settings ############
 # ######################################
 
+# The service key words (BATTERY_SERVICE_NAME, MULTI_KEY_WORD, MPPT_KEY_WORD)
+# must be the beginning of the DBus service name.
 # Key world to identify services of physical Serial Batteries (and SmartShunt if available). You don't need to change it.
 BATTERY_SERVICE_NAME = "com.victronenergy.battery"
 
@@ -44,7 +46,7 @@ MPPT_KEY_WORD = "com.victronenergy.solarcharger"
 # Key world to identify services of SmartShunt, if you use it for current into DC loads. You don't need to change it.
 SMARTSHUNT_NAME_KEY_WORD = "SmartShunt"
 
-# Trials to identify of all batteries before exit and restart.
+# Time to identify all services (in units of 5 seconds) before exit and restart.
 SEARCH_TRIALS = 10
 
 # Trials to get consistent data of all batteries before exit and restart.
@@ -72,6 +74,10 @@ ZERO_SOC = False
 # The "charge" file is read on start of this program.
 CHARGE_SAVE_PRECISION = 0.0025
 
+# Minimum time in seconds between two updates of the "charge" file to reduce wear of the flash memory.
+# The actual charge is always saved when the program is stopped.
+CHARGE_SAVE_PERIOD = 60
+
 # ######################################
 # #### Charge/Discharge parameters #####
 # ######################################